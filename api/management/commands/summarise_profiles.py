@@ -0,0 +1,91 @@
+import io
+import json
+import pstats
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    A management command that summarises the profiles captured by `ProfilingMixin`.
+
+    The cProfile stats of every captured request are combined to list the functions that took 
+    the most time, and the allocations recorded with each capture are added up by source line 
+    to list the lines that allocated the most memory.
+
+    Example:
+        ./manage.py summarise_profiles --limit 10 --sort tottime
+    """
+    help = "Summarises the top functions and allocations across the captured request profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory", 
+            default=None, 
+            help="The directory of captured profiles, defaults to MAGNIFICENCE_PROFILING's.",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=20, help="The number of functions and allocations to show."
+        )
+        parser.add_argument(
+            "--sort", 
+            default="cumulative", 
+            choices=["cumulative", "tottime", "ncalls"], 
+            help="The cProfile stat to sort functions by.",
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options["directory"] or settings.MAGNIFICENCE_PROFILING["DIRECTORY"])
+        # Only captures with both files are summarised, so every count covers the same profiles.
+        captures = [
+            capture 
+            for capture in sorted(directory.glob("*.json")) 
+            if capture.with_suffix(".prof").exists()
+        ]
+        if not captures:
+            raise CommandError(f"No captured profiles found in '{directory}'.")
+
+        profiles = []
+        durations = []
+        allocations = defaultdict(lambda: {"size_diff": 0, "count_diff": 0})
+        for capture in captures:
+            try:
+                metadata = json.loads(capture.read_text())
+                duration = float(metadata["duration_ms"])
+                capture_allocations = [
+                    (allocation["location"], allocation["size_diff"], allocation["count_diff"])
+                    for allocation in metadata["allocations"]
+                ]
+            except (ValueError, TypeError, KeyError) as exc:
+                raise CommandError(f"Malformed profile metadata in '{capture}': {exc!r}") from exc
+
+            profiles.append(str(capture.with_suffix(".prof")))
+            durations.append(duration)
+            for location, size_diff, count_diff in capture_allocations:
+                totals = allocations[location]
+                totals["size_diff"] += size_diff
+                totals["count_diff"] += count_diff
+
+        self.stdout.write(
+            f"{len(profiles)} profiles, mean duration {sum(durations) / len(durations):.1f} ms, "
+            f"max {max(durations):.1f} ms\n"
+        )
+
+        stream = io.StringIO()
+        stats = pstats.Stats(*profiles, stream=stream)
+        stats.sort_stats(options["sort"]).print_stats(options["limit"])
+        self.stdout.write("Top functions:")
+        self.stdout.write(stream.getvalue())
+
+        self.stdout.write("Top allocations:")
+        top_allocations = sorted(
+            allocations.items(), key=lambda item: item[1]["size_diff"], reverse=True
+        )[:options["limit"]]
+        for location, totals in top_allocations:
+            self.stdout.write(
+                f"  {totals['size_diff'] / 1024:>10.1f} KiB  {totals['count_diff']:>8} blocks  "
+                f"{location}"
+            )
@@ -0,0 +1,149 @@
+import cProfile
+import json
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+
+# tracemalloc traces the whole process and cProfile allows one active profiler per process from 
+# Python 3.12, so only one request is captured at a time.
+_capture_lock = threading.Lock()
+
+
+class ProfilingMixin:
+    """
+    A view mixin that captures a cProfile profile and the tracemalloc allocations of individual
+    requests, and writes them to disk for inspection with the `summarise_profiles` command.
+
+    Profiling is opt-in and configured with the `MAGNIFICENCE_PROFILING` setting. When it is
+    enabled, a request is profiled if it sends the configured header, or at random according to
+    the configured sample rate. When it is disabled, `dispatch` only checks the setting before
+    handing over to the view.
+
+    Only one request is captured at a time, and a request that would be profiled while another
+    capture is in progress is handled without profiling. tracemalloc traces the whole process,
+    so the allocations recorded for a capture also include those made by any requests handled
+    on other threads at the same time, profiled or not.
+
+    Each profiled request writes two files to the configured directory, sharing a name made of
+    the capture time and a unique ID: a `.prof` file of cProfile stats that can be loaded with
+    `pstats`, and a `.json` file of the request metadata and the top allocations made while it was
+    handled. Only the most recent `MAX_PROFILES` captures are kept.
+
+    Settings:
+        MAGNIFICENCE_PROFILING = {
+            "ENABLED": False,
+            "HEADER": "X-Magnificence-Profile",
+            "SAMPLE_RATE": 0.0,
+            "DIRECTORY": BASE_DIR / "profiles",
+            "MAX_PROFILES": 100,
+            "TOP_ALLOCATIONS": 25,
+        }
+
+    Example:
+        class GetMagnificenceDataView(ProfilingMixin, APIView):
+            ...
+
+        curl -H "X-Magnificence-Profile: 1" http://127.0.0.1:8000/api/get-magnificence-data/
+    """
+    def dispatch(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        config = settings.MAGNIFICENCE_PROFILING
+        if not config["ENABLED"]:
+            return super().dispatch(request, *args, **kwargs)
+
+        if request.headers.get(config["HEADER"]):
+            trigger = "header"
+        elif random.random() < config["SAMPLE_RATE"]:
+            trigger = "sample"
+        else:
+            return super().dispatch(request, *args, **kwargs)
+
+        if not _capture_lock.acquire(blocking=False):
+            return super().dispatch(request, *args, **kwargs)
+        try:
+            return self._profile_dispatch(config, trigger, request, *args, **kwargs)
+        finally:
+            _capture_lock.release()
+
+    def _profile_dispatch(
+            self,
+            config: dict,
+            trigger: str,
+            request: HttpRequest,
+            *args,
+            **kwargs
+        ) -> HttpResponse:
+        """
+        Handles the request under cProfile and tracemalloc, rendering the response so that its
+        cost is included, and writes the captured profile to disk.
+        """
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+
+        profiler = cProfile.Profile()
+        started_at = time.perf_counter()
+        profiler.enable()
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            if callable(getattr(response, "render", None)):
+                response.render()
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - started_at
+            after = tracemalloc.take_snapshot()
+            if not was_tracing:
+                tracemalloc.stop()
+
+        allocations = after.compare_to(before, "lineno")[:config["TOP_ALLOCATIONS"]]
+        metadata = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "trigger": trigger,
+            "view": type(self).__name__,
+            "method": request.method,
+            "path": request.path,
+            "query_string": request.META.get("QUERY_STRING", ""),
+            "status_code": response.status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "allocations": [
+                {
+                    "location": str(allocation.traceback),
+                    "size_diff": allocation.size_diff,
+                    "count_diff": allocation.count_diff,
+                }
+                for allocation in allocations
+            ],
+        }
+        _write_profile(Path(config["DIRECTORY"]), profiler, metadata, config["MAX_PROFILES"])
+
+        return response
+
+
+def _write_profile(
+        directory: Path,
+        profiler: cProfile.Profile,
+        metadata: dict,
+        max_profiles: int
+    ):
+    """
+    Writes a captured profile and its metadata to `directory`, removing the oldest captures so
+    that no more than `max_profiles` are kept.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+
+    profiler.dump_stats(directory / f"{name}.prof")
+    (directory / f"{name}.json").write_text(json.dumps(metadata, indent=2))
+
+    captures = sorted(directory.glob("*.json"))
+    for capture in captures[:max(len(captures) - max_profiles, 0)]:
+        capture.with_suffix(".prof").unlink(missing_ok=True)
+        capture.unlink(missing_ok=True)
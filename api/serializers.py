@@ -1,8 +1,12 @@
 from collections import Counter
 
+from django.conf import settings
 from rest_framework import serializers
 
 
+ALL_SOURCES = "all"
+
+
 # Inbound Serializer
 class InboundSerializer(serializers.Serializer):
     """
@@ -112,3 +116,84 @@ class OutboundSerializer(serializers.ListSerializer):
                 })
         
         return value
+
+
+# Query Serializers
+class SourceQuerySerializer(serializers.Serializer):
+    """
+    Serializer for validating the query parameter used to choose which of the 
+    `MAGNIFICENCE_SOURCES` to fetch data from.
+
+    Fields:
+        source (str, optional): The name of a configured source, or `all` to fetch every source. 
+            If not provided, `MAGNIFICENCE_DEFAULT_SOURCE` is used.
+    """
+    source = serializers.CharField(required=False)
+
+    def validate_source(self, value):
+        if value != ALL_SOURCES and value not in settings.MAGNIFICENCE_SOURCES:
+            raise serializers.ValidationError(f"'{value}' is not a valid source.")
+        return value
+
+
+class SquadQuerySerializer(SourceQuerySerializer):
+    """
+    Serializer for validating the query parameters used to choose how the Magnificent 7 are 
+    selected.
+
+    By default the top players in each position are selected on their own. In `optimal` mode the 
+    best squad is selected as a whole, limited by a total `now_cost` budget and a maximum number 
+    of players from any one team.
+
+    Fields:
+        source (str, optional): See `SourceQuerySerializer`.
+        mode (str): Either `top` (the default) or `optimal`.
+        budget (int, optional): The maximum total `now_cost` of the squad in `optimal` mode.
+        max_per_team (int): The maximum number of players from any one team in `optimal` mode, 
+            defaults to 3.
+
+    Example:
+        serializer = SquadQuerySerializer(data={"mode": "optimal", "budget": "450"})
+        if serializer.is_valid():
+            query = serializer.validated_data
+        else:
+            serializer.errors
+    """
+    mode = serializers.ChoiceField(choices=["top", "optimal"], default="top")
+    budget = serializers.IntegerField(min_value=0, required=False)
+    max_per_team = serializers.IntegerField(min_value=1, default=3)
+
+
+class PlayerRankQuerySerializer(SourceQuerySerializer):
+    """
+    Serializer for validating the query parameters used to look up a player's rank, either by 
+    their ID or by their name, from a single source.
+
+    Fields:
+        source (str, optional): See `SourceQuerySerializer`, except that `all` is not allowed.
+        id (int, optional): The ID of the player.
+        name (str, optional): The name of the player, as shown in the Magnificent 7, or their 
+            full name, second name or surname.
+
+    Example:
+        serializer = PlayerRankQuerySerializer(data={"name": "M.Salah"})
+        if serializer.is_valid():
+            query = serializer.validated_data
+        else:
+            serializer.errors
+    """
+    id = serializers.IntegerField(required=False)
+    name = serializers.CharField(required=False)
+
+    def validate_source(self, value):
+        value = super().validate_source(value)
+        if value == ALL_SOURCES:
+            raise serializers.ValidationError("Player ranks are only available for one source.")
+        return value
+
+    def validate(self, attrs):
+        if "id" in attrs and "name" in attrs:
+            raise serializers.ValidationError({"player": "Only one of id or name is allowed."})
+        if "id" not in attrs and "name" not in attrs:
+            raise serializers.ValidationError({"player": "Either an id or a name is required."})
+        return attrs
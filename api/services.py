@@ -1,18 +1,36 @@
+import re
+import unicodedata
+from bisect import bisect_right, insort
+from collections import Counter
+from typing import Iterator
+
+from api.snapshots import Player
+
+
+POSITION_REQUIREMENTS = {
+    1: 1,  # Goalkeepers
+    2: 2,  # Defenders
+    3: 3,  # Midfielders
+    4: 1   # Forwards
+}
+
+
 class GetMagnificent7:
     """
     A service that processes a list of players and returns the top 7 based on their total goals 
     and assists, optionally filtered by a specific team.
 
     The service takes a list of players (`elements`) and their corresponding position types 
-    (`element_types`). It filters players by their position, sorts them by their combined total 
-    of goals and assists, and selects the top players in each position 
-    (1 GKP, 2 DEF, 3 MID, 1 FWD).
+    (`element_types`). Players can be given as `Player` records or as raw dictionaries from the 
+    API, which are converted to `Player` records first. It filters players by their position, 
+    sorts them by their combined total of goals and assists, and selects the top players in each 
+    position (1 GKP, 2 DEF, 3 MID, 1 FWD).
 
     Optionally, the service can filter the players by a specific team if a `team_id` is provided. 
     If no `team_id` is provided, the top 7 players from the entire league are returned.
 
     Attributes:
-        elements (list): A list of dictionaries containing details of each player.
+        elements (list): A list of `Player` records containing details of each player.
         element_types (list): A list of dictionaries containing position metadata.
         team_id (int, optional): The ID of the team to filter the players by.
 
@@ -28,8 +46,16 @@ class GetMagnificent7:
         team_id = 1  # Optional team_id to filter by "Arsenal", for example
         GetMagnificent7(elements, element_types, team_id).run()
     """
-    def __init__(self, elements: list[dict], element_types: list[dict], team_id: int = None):
-        self.elements = elements
+    def __init__(
+            self, 
+            elements: list[Player | dict], 
+            element_types: list[dict], 
+            team_id: int = None
+        ):
+        self.elements = [
+            player if isinstance(player, Player) else Player.from_element(player)
+            for player in elements
+        ]
         self.element_types = element_types
         self.team_id = team_id
 
@@ -42,21 +68,21 @@ class GetMagnificent7:
                 return element_type["singular_name_short"]
         return ""
     
-    def _filter_by_position(self, position_id: int) -> list[dict]:
+    def _filter_by_position(self, position_id: int) -> list[Player]:
         """
         Filters players based on player's position, if team_id is present then filter 
         players in that team.
         """
-        players = [player for player in self.elements if player["element_type"] == position_id]
+        players = [player for player in self.elements if player.element_type == position_id]
 
         if self.team_id:
-            players = [player for player in players if player.get("team") == self.team_id]
+            players = [player for player in players if player.team == self.team_id]
         
         return players
     
     def _top_players_in_position(
             self, position_name: str, 
-            players: list[dict], 
+            players: list[Player], 
             position_count: int
         ) -> list[dict]:
         """
@@ -66,7 +92,7 @@ class GetMagnificent7:
         """
         players_sorted = sorted(
             players, 
-            key=lambda p: p["goals_scored"] + p["assists"], 
+            key=lambda p: p.total_goals_assists, 
             reverse=True
         )
 
@@ -74,10 +100,9 @@ class GetMagnificent7:
         actual_count = min(position_count, len(players_sorted))
         for i in range(actual_count):
             player = players_sorted[i]
-            total_goals_assists = player["goals_scored"] + player["assists"]
             top_players.append({
-                "name": player["web_name"],
-                "total_goals_assists": total_goals_assists,
+                "name": player.web_name,
+                "total_goals_assists": player.total_goals_assists,
                 "position": position_name,
             })
         
@@ -89,17 +114,520 @@ class GetMagnificent7:
         players by position, sorts them, and returns the top players according to predefined 
         requirements for each position.
         """
-        position_requirements = {
-            1: 1,  # Goalkeepers
-            2: 2,  # Defenders
-            3: 3,  # Midfielders
-            4: 1   # Forwards
-        }
-
         magnificent_7 = []
-        for element_type, count in position_requirements.items():
+        for element_type, count in POSITION_REQUIREMENTS.items():
             position_name = self._get_position_name(element_type)
             players = self._filter_by_position(element_type)
             magnificent_7 += self._top_players_in_position(position_name, players, count)
 
-        return magnificent_7
\ No newline at end of file
+        return magnificent_7
+
+
+class RankPlayers:
+    """
+    A service that ranks every player by their total goals and assists, the same score used by 
+    `GetMagnificent7`, optionally filtered by position and team.
+
+    The ranked players are yielded one at a time as dictionaries containing the player's rank, 
+    name, position name, team name and score, so that callers can stream them without building 
+    the full list of results. A player's rank is one more than the number of players with a 
+    higher score, so players with the same score share a rank.
+
+    Attributes:
+        elements (list): A list of `Player` records containing details of each player.
+        element_types (list): A list of dictionaries containing position metadata.
+        position_id (int, optional): The ID of the position to filter the players by.
+        team_id (int, optional): The ID of the team to filter the players by.
+
+    Example:
+        for row in RankPlayers(snapshot.players, snapshot.element_types, position_id=3).run():
+            print(row)  # {"rank": 1, "id": 328, "name": "M.Salah", ...}
+    """
+    def __init__(
+            self, 
+            elements: list[Player], 
+            element_types: list[dict], 
+            position_id: int = None, 
+            team_id: int = None
+        ):
+        self.elements = elements
+        self.element_types = element_types
+        self.position_id = position_id
+        self.team_id = team_id
+
+    def run(self) -> Iterator[dict]:
+        """
+        Main method that yields the filtered players in descending order of their total goals 
+        and assists.
+        """
+        position_names = {
+            element_type["id"]: element_type["singular_name_short"] 
+            for element_type in self.element_types
+        }
+
+        players = [
+            player for player in self.elements 
+            if (not self.position_id or player.element_type == self.position_id)
+            and (not self.team_id or player.team == self.team_id)
+        ]
+        players.sort(key=lambda p: p.total_goals_assists, reverse=True)
+
+        rank = 0
+        previous_score = None
+        for position, player in enumerate(players, start=1):
+            # Players with the same score share a rank, as in `PlayerRankings`.
+            if player.total_goals_assists != previous_score:
+                rank = position
+                previous_score = player.total_goals_assists
+            yield {
+                "rank": rank,
+                "id": player.id,
+                "name": player.web_name,
+                "position": position_names.get(player.element_type, ""),
+                "team": player.team_name,
+                "total_goals_assists": player.total_goals_assists,
+            }
+
+
+class GetOptimalSquad:
+    """
+    A service that selects the 7 players with the highest combined total of goals and assists 
+    (1 GKP, 2 DEF, 3 MID, 1 FWD) whose total `now_cost` is within a budget and which has no more 
+    than `max_per_team` players from any one team.
+
+    Unlike `GetMagnificent7`, which picks the top players in each position on their own, this 
+    service solves for the best squad as a whole. The candidates in each position are ranked by 
+    the same score as `GetMagnificent7`, and players that can always be swapped for a player with 
+    a score at least as high and a cost at least as low are discarded. The remaining candidates 
+    are searched with branch-and-bound, pruning any branch that cannot beat the best squad found 
+    so far or cannot be completed within the budget.
+
+    Attributes:
+        elements (list): A list of `Player` records containing details of each player.
+        element_types (list): A list of dictionaries containing position metadata.
+        budget (int, optional): The maximum total `now_cost` of the squad. If not provided the 
+            squad is not limited by cost.
+        max_per_team (int): The maximum number of players from any one team. Ignored when 
+            filtering by `team_id`, as every player is then from the same team.
+        team_id (int, optional): The ID of the team to filter the players by.
+
+    Example:
+        squad = GetOptimalSquad(snapshot.players, snapshot.element_types, budget=450).run()
+        if not squad:
+            ...  # No squad satisfies the budget and team limits
+    """
+    def __init__(
+            self, 
+            elements: list[Player], 
+            element_types: list[dict], 
+            budget: int = None, 
+            max_per_team: int = 3, 
+            team_id: int = None
+        ):
+        self.elements = elements
+        self.element_types = element_types
+        self.budget = budget
+        self.max_per_team = max_per_team if not team_id else sum(POSITION_REQUIREMENTS.values())
+        self.team_id = team_id
+
+    def _candidates_in_position(
+            self, 
+            position_id: int, 
+            position_count: int, 
+            max_cost: int = None
+        ) -> list[Player]:
+        """
+        Ranks the players in a position by score (cheapest first on ties) and discards those 
+        that cannot be in the best squad, including any that cost more than `max_cost`.
+
+        A player can be discarded when enough higher ranked players also cost no more than them: 
+        `position_count` from their own team, or `position_count + 6 // max_per_team` from 
+        distinct teams, as the other 6 players can fill at most `6 // max_per_team` teams. In 
+        any squad containing the player, one of those players is not already picked and can 
+        replace them without breaking the budget or team limits.
+        """
+        players = sorted(
+            (
+                player for player in self.elements 
+                if player.element_type == position_id
+                and (not self.team_id or player.team == self.team_id)
+                and (max_cost is None or player.now_cost <= max_cost)
+            ),
+            key=lambda p: (-p.total_goals_assists, p.now_cost)
+        )
+
+        squad_size = sum(POSITION_REQUIREMENTS.values())
+        distinct_teams_needed = position_count + (squad_size - 1) // self.max_per_team
+        candidates = []
+        for player in players:
+            same_team = 0
+            dominating_teams = set()
+            for candidate in candidates:
+                if candidate.now_cost <= player.now_cost:
+                    same_team += candidate.team == player.team
+                    dominating_teams.add(candidate.team)
+            if same_team < position_count and len(dominating_teams) < distinct_teams_needed:
+                candidates.append(player)
+
+        return candidates
+
+    def _max_costs(self) -> dict[int, int | None]:
+        """
+        Finds the most a player in each position can cost once the cheapest players are bought 
+        for every other slot, or `None` for every position if there is no budget.
+        """
+        max_costs = dict.fromkeys(POSITION_REQUIREMENTS)
+        if self.budget is None:
+            return max_costs
+
+        eligible_costs = {position_id: [] for position_id in POSITION_REQUIREMENTS}
+        for player in self.elements:
+            if player.element_type in eligible_costs and (
+                not self.team_id or player.team == self.team_id
+            ):
+                eligible_costs[player.element_type].append(player.now_cost)
+
+        cheapest = {
+            position_id: sorted(eligible_costs[position_id])[:count]
+            for position_id, count in POSITION_REQUIREMENTS.items()
+        }
+        cheapest_squad = sum(sum(costs) for costs in cheapest.values())
+        for position_id, costs in cheapest.items():
+            if costs:
+                max_costs[position_id] = self.budget - cheapest_squad + costs[-1]
+        return max_costs
+
+    def _slot_plan(self) -> tuple[list[int], list[int], list[list[tuple[int, int]]]]:
+        """
+        Lays out one slot per player in the squad, searching the positions with the fewest 
+        candidates first so that the search branches as late as possible. Returns the position of 
+        each slot, the number of slots left in its position from each slot onwards, and the 
+        count of each position from each slot onwards.
+        """
+        position_order = sorted(POSITION_REQUIREMENTS, key=lambda p: len(self._candidates[p]))
+        slots = [
+            position_id 
+            for position_id in position_order 
+            for _ in range(POSITION_REQUIREMENTS[position_id])
+        ]
+        remaining_in_position = [slots[i:].count(position) for i, position in enumerate(slots)]
+        later_slots = [list(Counter(slots[i:]).items()) for i in range(len(slots))]
+        return slots, remaining_in_position, later_slots
+
+    def _score_bounds(self) -> tuple[dict[int, list[int]], dict[int, int]]:
+        """
+        Builds the running totals of score of the candidates in each position, and the best 
+        possible score of the positions searched after each position, ignoring cost.
+        """
+        score_sums = {}
+        for position_id, players in self._candidates.items():
+            sums = [0]
+            for player in players:
+                sums.append(sums[-1] + player.total_goals_assists)
+            score_sums[position_id] = sums
+
+        later_score = {}
+        total = 0
+        for position_id in reversed(list(dict.fromkeys(self._slots))):
+            later_score[position_id] = total
+            count = min(POSITION_REQUIREMENTS[position_id], len(self._candidates[position_id]))
+            total += score_sums[position_id][count]
+        return score_sums, later_score
+
+    def _cost_bounds(self) -> tuple[list[int], dict[int, list[int]], dict[int, list[list[int]]]]:
+        """
+        Builds the lowest possible cost of the slots from each slot onwards, the candidates' costs 
+        in each position in ascending order, and the best total score of 1 to `count` candidates 
+        in each position who each cost no more than a given candidate's cost, with no more than 
+        `max_per_team` from a team.
+        """
+        later_cost = [0] * (len(self._slots) + 1)
+        for i in range(len(self._slots) - 1, -1, -1):
+            costs = sorted(player.now_cost for player in self._candidates[self._slots[i]])
+            remaining = self._remaining_in_position[i]
+            cheapest = costs[remaining - 1] if len(costs) >= remaining else 0
+            later_cost[i] = later_cost[i + 1] + cheapest
+
+        costs_ascending = {}
+        best_scores_by_cost = {}
+        for position_id, players in self._candidates.items():
+            players_by_cost = sorted(players, key=lambda p: p.now_cost)
+            costs_ascending[position_id] = [player.now_cost for player in players_by_cost]
+            max_count = POSITION_REQUIREMENTS[position_id]
+            best_scores = [[] for _ in range(max_count + 1)]
+            affordable = []
+            for player in players_by_cost:
+                insort(affordable, player, key=lambda p: -p.total_goals_assists)
+                # Taking the highest scores that fit within the team limit is the best choice.
+                totals = [0]
+                team_counts = Counter()
+                for candidate in affordable:
+                    if len(totals) > max_count:
+                        break
+                    if team_counts[candidate.team] < self.max_per_team:
+                        team_counts[candidate.team] += 1
+                        totals.append(totals[-1] + candidate.total_goals_assists)
+                for count in range(1, max_count + 1):
+                    best_scores[count].append(totals[min(count, len(totals) - 1)])
+            best_scores_by_cost[position_id] = best_scores
+        return later_cost, costs_ascending, best_scores_by_cost
+
+    def _knapsack_bounds(self) -> dict[int, list[list[float]]]:
+        """
+        Builds a knapsack table of the best total score of 1 to `count` candidates in each 
+        position for each total cost up to the most the position can cost, ignoring the team 
+        limits. There is no table without a budget.
+        """
+        if self.budget is None:
+            return {}
+
+        best_scores_by_total_cost = {}
+        for position_id, players in self._candidates.items():
+            max_count = POSITION_REQUIREMENTS[position_id]
+            costs = self._costs_ascending[position_id]
+            # No position can cost more than its most expensive candidates.
+            max_total = max(
+                min(
+                    self.budget - self._later_cost[0] + sum(costs[:max_count]), 
+                    sum(costs[-max_count:])
+                ), 
+                0
+            )
+            best_scores = [[0] * (max_total + 1)] + [
+                [float("-inf")] * (max_total + 1) for _ in range(max_count)
+            ]
+            for player in players:
+                score = player.total_goals_assists
+                cost = player.now_cost
+                if cost > max_total:
+                    continue
+                for count in range(max_count, 0, -1):
+                    fewer = best_scores[count - 1]
+                    current = best_scores[count]
+                    best_scores[count] = current[:cost] + [
+                        max(a, b + score) for a, b in zip(current[cost:], fewer)
+                    ]
+            best_scores_by_total_cost[position_id] = best_scores
+        return best_scores_by_total_cost
+
+    def _budget_bound(self, slot: int, budget_left: int) -> float:
+        """
+        The best possible score of the slots from `slot` onwards when the players in each 
+        position must be affordable, together and one by one, once the cheapest players are 
+        bought for the other slots.
+        """
+        bound = 0
+        for position_id, count in self._later_slots[slot]:
+            costs = self._costs_ascending[position_id]
+            if len(costs) < count:
+                return float("-inf")
+            # Every other slot costs at least the cheapest player left for it.
+            max_total = budget_left - self._later_cost[slot] + sum(costs[:count])
+            index = bisect_right(costs, max_total - sum(costs[:count - 1])) - 1
+            if index < 0:
+                return float("-inf")
+            position_bound = self._best_scores_by_cost[position_id][count][index]
+            if position_id in self._best_scores_by_total_cost:
+                best_scores = self._best_scores_by_total_cost[position_id][count]
+                position_bound = min(
+                    position_bound, best_scores[min(max_total, len(best_scores) - 1)]
+                )
+            bound += position_bound
+        return bound
+
+    def _search(self, slot: int, start: int, score: int, cost: int):
+        """
+        Tries every candidate from `start` onwards in `slot`, with `score` and `cost` spent on the 
+        slots before it, keeping the best squad found in `_best_squad`. Branches that cannot beat 
+        it or cannot be completed within the budget are pruned.
+        """
+        if slot == len(self._slots):
+            if score > self._best_score:
+                self._best_score = score
+                self._best_squad = list(self._squad)
+            return
+
+        budget = self._budget_limit
+        if self._budget_bound(slot, budget - cost) + score <= self._best_score:
+            return
+
+        position_id = self._slots[slot]
+        players = self._candidates[position_id]
+        sums = self._score_sums[position_id]
+        remaining = self._remaining_in_position[slot]
+        later = self._later_score[position_id]
+        later_cost = self._later_cost[slot + 1]
+        squad = self._squad
+        team_counts = self._team_counts
+        for i in range(start, len(players) - remaining + 1):
+            # Candidates are ranked by score, so no later candidate can do better either.
+            if score + sums[i + remaining] - sums[i] + later <= self._best_score:
+                break
+
+            player = players[i]
+            if cost + player.now_cost + later_cost > budget:
+                continue
+            if team_counts[player.team] >= self.max_per_team:
+                continue
+
+            squad.append(player)
+            team_counts[player.team] += 1
+            next_start = i + 1 if remaining > 1 else 0
+            self._search(
+                slot + 1, 
+                next_start, 
+                score + player.total_goals_assists, 
+                cost + player.now_cost
+            )
+            team_counts[player.team] -= 1
+            squad.pop()
+
+    def run(self) -> list[dict]:
+        """
+        Main method that searches for the best squad and returns it in the same format as 
+        `GetMagnificent7`, or an empty list if no squad satisfies the budget and team limits.
+        """
+        position_names = {
+            element_type["id"]: element_type["singular_name_short"] 
+            for element_type in self.element_types
+        }
+        max_costs = self._max_costs()
+        self._candidates = {
+            position_id: self._candidates_in_position(position_id, count, max_costs[position_id])
+            for position_id, count in POSITION_REQUIREMENTS.items()
+        }
+        self._slots, self._remaining_in_position, self._later_slots = self._slot_plan()
+        self._score_sums, self._later_score = self._score_bounds()
+        self._later_cost, self._costs_ascending, self._best_scores_by_cost = self._cost_bounds()
+        self._best_scores_by_total_cost = self._knapsack_bounds()
+
+        self._budget_limit = self.budget if self.budget is not None else float("inf")
+        self._best_score = -1
+        self._best_squad = []
+        self._squad = []
+        self._team_counts = Counter()
+        self._search(0, 0, 0, 0)
+
+        position_ids = list(POSITION_REQUIREMENTS)
+        best_squad = sorted(self._best_squad, key=lambda p: position_ids.index(p.element_type))
+        return [
+            {
+                "name": player.web_name,
+                "total_goals_assists": player.total_goals_assists,
+                "position": position_names.get(player.element_type, ""),
+            }
+            for player in best_squad
+        ]
+
+
+class PlayerRankings:
+    """
+    An index of every player's rank and percentile by their total goals and assists, league-wide, 
+    within their position and within their team.
+
+    The scores of each group of players are sorted once when the index is built, so that a 
+    player's rank and percentile within each group are found by binary search. The index also 
+    maps player IDs and names to players, so it can be built once per snapshot and serve every 
+    lookup. A player can be found by their display name or, failing that, by their full name, 
+    their second name or their surname, ignoring case and accents.
+
+    A player's rank is one more than the number of players in the group with a higher score, so 
+    players with the same score share a rank. Their percentile is the percentage of players in 
+    the group with the same or a lower score.
+
+    Attributes:
+        elements (list): A list of `Player` records containing details of each player.
+        element_types (list): A list of dictionaries containing position metadata.
+
+    Example:
+        rankings = PlayerRankings(snapshot.players, snapshot.element_types)
+        [salah] = rankings.find_by_name("Salah")
+        rankings.rank(salah)  # {"id": 328, ..., "rankings": {"league": {"rank": 1, ...}, ...}}
+    """
+    def __init__(self, elements: list[Player], element_types: list[dict]):
+        self.position_names = {
+            element_type["id"]: element_type["singular_name_short"] 
+            for element_type in element_types
+        }
+        self.players_by_id = {player.id: player for player in elements}
+        self.players_by_name = {}
+        self.players_by_other_name = {}
+        scores = {"league": {None: []}, "position": {}, "team": {}}
+        for player in elements:
+            self.players_by_name.setdefault(_normalize_name(player.web_name), []).append(player)
+            other_names = {
+                _normalize_name(name) 
+                for name in (
+                    f"{player.first_name} {player.second_name}", 
+                    player.second_name, 
+                    *player.second_name.split()[-1:], 
+                    re.split(r"[.\s]", player.web_name)[-1],
+                )
+            }
+            for name in other_names - {"", _normalize_name(player.web_name)}:
+                self.players_by_other_name.setdefault(name, []).append(player)
+            score = player.total_goals_assists
+            scores["league"][None].append(score)
+            scores["position"].setdefault(player.element_type, []).append(score)
+            scores["team"].setdefault(player.team, []).append(score)
+
+        for groups in scores.values():
+            for group_scores in groups.values():
+                group_scores.sort()
+        self.scores = scores
+
+    def find_by_id(self, player_id: int) -> Player | None:
+        """
+        Retrieves the player with the given ID.
+        """
+        return self.players_by_id.get(player_id)
+
+    def find_by_name(self, name: str) -> list[Player]:
+        """
+        Retrieves the players whose display name matches `name`, or if there are none, the 
+        players whose full name, second name or display surname matches it, ignoring case and 
+        accents.
+        """
+        name = _normalize_name(name)
+        return self.players_by_name.get(name) or self.players_by_other_name.get(name, [])
+
+    def _rank_in_group(self, group_scores: list[int], score: int) -> dict:
+        """
+        Finds the rank and percentile of a score within a group's sorted scores.
+        """
+        at_or_below = bisect_right(group_scores, score)
+        return {
+            "rank": len(group_scores) - at_or_below + 1,
+            "percentile": round(at_or_below / len(group_scores) * 100, 1),
+            "players": len(group_scores),
+        }
+
+    def rank(self, player: Player) -> dict:
+        """
+        Retrieves the player's details with their rank and percentile league-wide, within their 
+        position and within their team.
+        """
+        score = player.total_goals_assists
+        league_scores = self.scores["league"][None]
+        position_scores = self.scores["position"][player.element_type]
+        team_scores = self.scores["team"][player.team]
+        return {
+            "id": player.id,
+            "name": player.web_name,
+            "position": self.position_names.get(player.element_type, ""),
+            "team": player.team_name,
+            "total_goals_assists": score,
+            "rankings": {
+                "league": self._rank_in_group(league_scores, score),
+                "position": self._rank_in_group(position_scores, score),
+                "team": self._rank_in_group(team_scores, score),
+            },
+        }
+
+
+def _normalize_name(name: str) -> str:
+    """
+    Normalizes a player's name for matching, ignoring case, accents and surrounding whitespace.
+    """
+    decomposed = unicodedata.normalize("NFKD", name.strip())
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
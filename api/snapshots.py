@@ -0,0 +1,250 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from typing import Any, Callable, NamedTuple
+
+import requests
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from api.serializers import ALL_SOURCES, InboundSerializer
+
+
+class Player(NamedTuple):
+    """
+    A compact, immutable record of a single player from the external API.
+
+    Each entry in the API's `elements` list is a dictionary with close to a hundred keys, while
+    the services and serializers only read a handful of them. A `Player` keeps just those fields
+    in a tuple, with the player and team names interned so that repeated names share one string.
+
+    Attributes:
+        id (int): The ID of the player.
+        web_name (str): The display name of the player.
+        first_name (str): The first name of the player.
+        second_name (str): The second name of the player.
+        element_type (int): The ID of the player's position.
+        team (int): The ID of the player's team.
+        team_name (str): The name of the player's team.
+        goals_scored (int): The number of goals scored by the player.
+        assists (int): The number of assists made by the player.
+        now_cost (int): The current cost of the player, in tenths of a million.
+
+    Example:
+        element = {"id": 1, "element_type": 3, "goals_scored": 1, "assists": 2,
+                   "web_name": "M.Salah", "first_name": "Mohamed", "second_name": "Salah", 
+                   "team": 12, "now_cost": 130, ...}
+        player = Player.from_element(element, {12: "Liverpool"})
+        player.total_goals_assists  # 3
+    """
+    id: int
+    web_name: str
+    first_name: str
+    second_name: str
+    element_type: int
+    team: int
+    team_name: str
+    goals_scored: int
+    assists: int
+    now_cost: int
+
+    @classmethod
+    def from_element(cls, element: dict, team_names: dict[int, str] = None) -> "Player":
+        """
+        Builds a player record from a raw `elements` entry, looking up the team name in
+        `team_names` if provided.
+        """
+        team = element.get("team")
+        team_name = (team_names or {}).get(team, "")
+        return cls(
+            id=element.get("id"),
+            web_name=sys.intern(element["web_name"]),
+            first_name=sys.intern(element.get("first_name", "")),
+            second_name=sys.intern(element.get("second_name", "")),
+            element_type=element["element_type"],
+            team=team,
+            team_name=sys.intern(team_name),
+            goals_scored=element["goals_scored"],
+            assists=element["assists"],
+            now_cost=element.get("now_cost", 0),
+        )
+
+    @property
+    def total_goals_assists(self) -> int:
+        """
+        The score players are ranked by: their total goals and assists.
+        """
+        return self.goals_scored + self.assists
+
+
+class FetchFailed(APIException):
+    """
+    Raised when the external API does not respond with a 200 status, or does not respond within
+    `MAGNIFICENCE_FETCH_TIMEOUT` seconds.
+    """
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = {"error": "Failed to fetch data"}
+
+
+class Snapshot:
+    """
+    The parts of a single response from the external API that the service needs, with the
+    players converted to `Player` records once at ingest.
+
+    Snapshots are cached by `fetch_snapshot` and shared between requests, so anything derived 
+    from a snapshot that is costly to build can be stored on it with `memoize`.
+
+    Attributes:
+        players (tuple): The `Player` records for every entry in `elements`.
+        element_types (list): A list of dictionaries containing position metadata.
+        teams (dict): A mapping of team ID to team name.
+
+    Example:
+        snapshot = Snapshot.from_payload(response.json())
+        GetMagnificent7(snapshot.players, snapshot.element_types).run()
+    """
+    __slots__ = ("players", "element_types", "teams", "_memo")
+
+    def __init__(
+            self, 
+            players: tuple[Player, ...], 
+            element_types: list[dict], 
+            teams: dict[int, str]
+        ):
+        self.players = players
+        self.element_types = element_types
+        self.teams = teams
+        self._memo = {}
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "Snapshot":
+        """
+        Converts a validated API payload into a snapshot. Only the position metadata is kept
+        from the raw payload, so the caller can drop it as soon as this returns.
+        """
+        teams = {team["id"]: sys.intern(team["name"]) for team in payload["teams"]}
+        players = tuple(Player.from_element(element, teams) for element in payload["elements"])
+        element_types = [
+            {"id": element_type["id"], "singular_name_short": element_type["singular_name_short"]}
+            for element_type in payload["element_types"]
+        ]
+        return cls(players, element_types, teams)
+
+    def get_team_id(self, team_name: str) -> int | None:
+        """
+        Retrieves the ID of the team matching `team_name`, ignoring case.
+        """
+        for team_id, name in self.teams.items():
+            if name.lower() == team_name.lower():
+                return team_id
+        return None
+
+    def get_position_id(self, position_name: str) -> int | None:
+        """
+        Retrieves the ID of the position matching the short `position_name`, ignoring case.
+        """
+        for element_type in self.element_types:
+            if element_type["singular_name_short"].lower() == position_name.lower():
+                return element_type["id"]
+        return None
+
+    def memoize(self, key: Any, build: Callable[[], Any]) -> Any:
+        """
+        Retrieves the value stored on the snapshot under `key`, building it with `build` the 
+        first time. Concurrent requests may both build the value, and the last one is kept.
+        """
+        try:
+            return self._memo[key]
+        except KeyError:
+            value = self._memo[key] = build()
+            return value
+
+
+_snapshot_cache: dict[str, tuple[float, Snapshot]] = {}
+_snapshot_cache_lock = threading.Lock()
+
+
+def fetch_snapshot(api_url: str) -> Snapshot:
+    """
+    Fetches the data from the external API, validates it using the `InboundSerializer` and 
+    converts it to a `Snapshot`. Snapshots are cached by URL for `MAGNIFICENCE_SNAPSHOT_TTL` 
+    seconds, and errors are never cached.
+
+    Raises `FetchFailed` if the external API fails to respond in time, or a `ValidationError` 
+    containing the serializer errors if the data is not valid.
+    """
+    ttl = settings.MAGNIFICENCE_SNAPSHOT_TTL
+    with _snapshot_cache_lock:
+        cached = _snapshot_cache.get(api_url)
+    if cached and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+
+    try:
+        response = requests.get(api_url, timeout=settings.MAGNIFICENCE_FETCH_TIMEOUT)
+    except requests.Timeout:
+        raise FetchFailed()
+    if response.status_code != 200:
+        raise FetchFailed()
+
+    response_data = response.json()
+    InboundSerializer(data=response_data).is_valid(raise_exception=True)
+    snapshot = Snapshot.from_payload(response_data)
+
+    if ttl:
+        with _snapshot_cache_lock:
+            _snapshot_cache[api_url] = (time.monotonic(), snapshot)
+    return snapshot
+
+
+def clear_snapshot_cache():
+    """
+    Removes every cached snapshot, so that the next request fetches from the external API.
+    """
+    with _snapshot_cache_lock:
+        _snapshot_cache.clear()
+
+
+def get_source_urls(source: str = None) -> dict[str, str]:
+    """
+    Retrieves the URLs of the sources to fetch for a `source` query param: the default source 
+    if none is given, every source for `all`, or else the named source.
+    """
+    sources = settings.MAGNIFICENCE_SOURCES
+    if source == ALL_SOURCES:
+        return dict(sources)
+    source = source or settings.MAGNIFICENCE_DEFAULT_SOURCE
+    return {source: sources[source]}
+
+
+@cache
+def _fetch_executor() -> ThreadPoolExecutor:
+    """
+    The thread pool shared by every request to fetch sources concurrently. It is created on first
+    use, so its size is fixed by `MAGNIFICENCE_FETCH_WORKERS` at that point.
+    """
+    return ThreadPoolExecutor(
+        max_workers=settings.MAGNIFICENCE_FETCH_WORKERS, 
+        thread_name_prefix="magnificence-fetch"
+    )
+
+
+def fetch_snapshots(source_urls: dict[str, str]) -> dict[str, Snapshot]:
+    """
+    Fetches a snapshot for each of the named sources using `fetch_snapshot`. When there is more 
+    than one source they are fetched concurrently, so this takes as long as the slowest source.
+
+    If any source fails, the error of the first failing source in `source_urls` is raised.
+    """
+    if len(source_urls) == 1:
+        [(name, api_url)] = source_urls.items()
+        return {name: fetch_snapshot(api_url)}
+
+    futures = {
+        name: _fetch_executor().submit(fetch_snapshot, api_url) 
+        for name, api_url in source_urls.items()
+    }
+    return {name: future.result() for name, future in futures.items()}
@@ -1,6 +1,19 @@
+from django.conf import settings
 from django.urls import path
-from api.views import GetMagnificenceDataView
+from api.views import (
+    ExportPlayersView, 
+    GetMagnificenceDataView, 
+    GetPlayerRankView, 
+    get_magnificence_data_fast,
+)
+
+if settings.MAGNIFICENCE_FAST_PATH:
+    magnificence_data_view = get_magnificence_data_fast
+else:
+    magnificence_data_view = GetMagnificenceDataView.as_view()
 
 urlpatterns = [
-    path("get-magnificence-data/", GetMagnificenceDataView.as_view(), name="get_magnificence_data"),
-]
\ No newline at end of file
+    path("get-magnificence-data/", magnificence_data_view, name="get_magnificence_data"),
+    path("export-players/", ExportPlayersView.as_view(), name="export_players"),
+    path("player-rank/", GetPlayerRankView.as_view(), name="player_rank"),
+]
@@ -1,41 +1,81 @@
-import requests
+import json
+import zlib
+from typing import Iterator
 
 from django.conf import settings
-from django.http import HttpRequest
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
-from api.serializers import InboundSerializer, OutboundSerializer
-from api.services import GetMagnificent7
+from api.profiling import ProfilingMixin
+from api.serializers import (
+    ALL_SOURCES, 
+    OutboundSerializer, 
+    PlayerRankQuerySerializer, 
+    SourceQuerySerializer, 
+    SquadQuerySerializer,
+)
+from api.services import GetMagnificent7, GetOptimalSquad, PlayerRankings, RankPlayers
+from api.snapshots import Snapshot, fetch_snapshot, fetch_snapshots, get_source_urls
 
 
-class GetMagnificenceDataView(APIView):
+# The query params handled by `get_magnificence_data_fast`.
+FAST_PATH_QUERY_PARAMS = {"team_name", "source"}
+
+
+class OutboundDataInvalid(APIException):
+    """
+    Raised when the data generated for the response fails validation.
+    """
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+class GetMagnificenceDataView(ProfilingMixin, APIView):
     """
     A view to fetch and process magnificence data from an external API and return the top 7 
     players across the league, optionally filtered by a specific team.
 
-    This view handles a GET request to retrieve data from an external API endpoint. The response 
-    from the external API is validated using the `InboundSerializer`. If the data is valid, 
-    the data sets `elements` and `element_types` is used to generate the top 7 players using 
-    the `GetMagnificent7` service.
+    This view handles a GET request to retrieve data from one of the external API endpoints in 
+    `MAGNIFICENCE_SOURCES` using `fetch_snapshots`. The source can be chosen with the `source` 
+    query parameter, or `source=all` returns the top 7 players of every source, keyed by source 
+    name, fetching the sources concurrently. The response from the external API is validated 
+    using the `InboundSerializer`. If the data is valid, it is converted to a `Snapshot` of 
+    compact player records and the raw data is dropped. The snapshot's players and 
+    `element_types` are used to generate the top 7 players using the `GetMagnificent7` service.
 
     The user can optionally filter the top 7 players by passing a `team_name` query parameter. 
     If a `team_name` is provided, the view attempts to find the team and the `team_id` is passed 
     in the `GetMagnificent7` service. If the team name does not match any teams, an error message 
     is returned. Else, the top 7 players across the league are returned.
 
+    The user can also pass `mode=optimal` to select the best squad as a whole using the 
+    `GetOptimalSquad` service, limited by an optional total `budget` and a `max_per_team` number 
+    of players. These query parameters are validated using the `SquadQuerySerializer`.
+
     Once the top 7 players are determined, the data is serialized using `OutboundSerializer`. 
     The view returns a successful response if all data is valid, or appropriate error messages 
     if validation fails.
 
+    Individual requests can be profiled when `MAGNIFICENCE_PROFILING` is enabled, see 
+    `ProfilingMixin`.
+
     Query Parameters:
+        - source (str, optional): The name of the source to fetch from, or `all`.
         - team_name (str, optional): The name of the team to filter players by.
+        - mode (str, optional): `top` (the default) or `optimal`.
+        - budget (int, optional): The maximum total `now_cost` of the squad in `optimal` mode.
+        - max_per_team (int, optional): The maximum number of players from any one team in 
+          `optimal` mode, defaults to 3.
 
     Responses:
         - 200 OK: Returns the top 7 players if the data is processed successfully.
-        - 400 Bad Request: Returned if the inbound data fails validation, or if the provided 
-          `team_name` is not valid.
+        - 400 Bad Request: Returned if the query parameters or inbound data fail validation, if 
+          the provided `team_name` is not valid, or if no squad satisfies the budget and team 
+          limits.
         - 500 Internal Server Error: Returned if the outbound data fails validation.
 
     Args:
@@ -46,42 +86,312 @@ class GetMagnificenceDataView(APIView):
         message if the external API fails to respond.
     """
     def get(self, request: HttpRequest) -> Response:
-        api_url = settings.MAGNIFICENCE_API_URL
-        response = requests.get(api_url)
-
-        if response.status_code == 200:
-            response_data = response.json()
-            inbound_serializer = InboundSerializer(data=response_data)
-            if not inbound_serializer.is_valid():
-                return Response(inbound_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-            elements = response_data["elements"]
-            element_types = response_data["element_types"]
-            teams = response_data["teams"]
-
-            team_name = request.query_params.get("team_name") # optional param
-            team_id = None
-            if team_name:
-                for team in teams:
-                    if team["name"].lower() == team_name.lower():
-                        team_id = team["id"]
-                        break
-
-                if not team_id:
-                    return Response(
-                        {"error": f"'{team_name}' is not a valid team."}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            
-            magnificent_7_data = GetMagnificent7(elements, element_types, team_id).run()
-            
-            outbound_serializer = OutboundSerializer(data=magnificent_7_data)
-            if not outbound_serializer.is_valid():
+        query_serializer = SquadQuerySerializer(data=request.query_params)
+        if not query_serializer.is_valid():
+            return Response(query_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        query = query_serializer.validated_data
+
+        snapshots = fetch_snapshots(get_source_urls(query.get("source")))
+
+        team_name = request.query_params.get("team_name") # optional param
+        magnificent_7_data = {
+            name: _get_magnificent_7(snapshot, query, team_name) 
+            for name, snapshot in snapshots.items()
+        }
+
+        if query.get("source") == ALL_SOURCES:
+            return Response(magnificent_7_data, status=status.HTTP_200_OK)
+        [magnificent_7_data] = magnificent_7_data.values()
+        return Response(magnificent_7_data, status=status.HTTP_200_OK)
+
+
+_magnificence_data_view = GetMagnificenceDataView.as_view()
+
+
+class ExportPlayersView(APIView):
+    """
+    A view to export every player ranked by their total goals and assists as newline-delimited 
+    JSON, optionally filtered by position and team.
+
+    The data from the external API is fetched and validated in the same way as 
+    `GetMagnificenceDataView`, and the players are ranked using the `RankPlayers` service. Each 
+    row includes the name of the source it came from, and `source=all` exports the players of 
+    every source one source after another. Each player is encoded and written to a 
+    `StreamingHttpResponse` as it is produced, so the full export is never built in memory. If 
+    the client accepts gzip, the stream is compressed as it is written.
+
+    Query Parameters:
+        - source (str, optional): The name of the source to fetch from, or `all`.
+        - position (str, optional): The short name of the position to filter players by.
+        - team_name (str, optional): The name of the team to filter players by.
+
+    Responses:
+        - 200 OK: Streams one JSON object per line for each ranked player.
+        - 400 Bad Request: Returned if the external API fails to respond, the inbound data fails 
+          validation, or if the provided `source`, `position` or `team_name` is not valid.
+
+    Args:
+        request (HttpRequest): The incoming request object.
+
+    Returns:
+        A streaming NDJSON response of ranked players, or a JSON response containing an error 
+        message.
+    """
+    def get(self, request: HttpRequest) -> StreamingHttpResponse | Response:
+        query_serializer = SourceQuerySerializer(data=request.query_params)
+        if not query_serializer.is_valid():
+            return Response(query_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        source = query_serializer.validated_data.get("source")
+        snapshots = fetch_snapshots(get_source_urls(source))
+
+        position = request.query_params.get("position") # optional param
+        team_name = request.query_params.get("team_name") # optional param
+
+        # Find the filters for every source before streaming, so errors can still be returned.
+        rankings = {}
+        for name, snapshot in snapshots.items():
+            rankings[name] = RankPlayers(
+                snapshot.players, 
+                snapshot.element_types, 
+                _get_position_id(snapshot, position), 
+                _get_team_id(snapshot, team_name)
+            )
+
+        lines = (
+            json.dumps({**row, "source": name}).encode("utf-8") + b"\n" 
+            for name, ranking in rankings.items() 
+            for row in ranking.run()
+        )
+
+        accepts_gzip = _accepts_gzip(request.headers.get("Accept-Encoding", ""))
+        response = StreamingHttpResponse(
+            _gzip_stream(lines) if accepts_gzip else lines, 
+            content_type="application/x-ndjson"
+        )
+        response["Vary"] = "Accept-Encoding"
+        if accepts_gzip:
+            response["Content-Encoding"] = "gzip"
+        return response
+
+
+class GetPlayerRankView(APIView):
+    """
+    A view to find where a single player ranks by their total goals and assists, league-wide, 
+    among players in the same position and among players in the same team.
+
+    The data from the external API is fetched and validated in the same way as 
+    `GetMagnificenceDataView`. The player is looked up by `id` or `name` in a `PlayerRankings` 
+    index, which is built once per snapshot and reused for as long as the snapshot is cached, 
+    so each lookup is a binary search of already sorted scores.
+
+    Query Parameters:
+        - id (int, optional): The ID of the player.
+        - name (str, optional): The name of the player, matched against their display name, 
+          full name, second name or surname. Exactly one of `id` or `name` is required.
+        - source (str, optional): The name of the source to fetch from.
+
+    Responses:
+        - 200 OK: Returns the player with their rank and percentile in each group.
+        - 400 Bad Request: Returned if the query parameters or inbound data fail validation, or 
+          if the name matches more than one player.
+        - 404 Not Found: Returned if no player matches the `id` or `name`.
+
+    Args:
+        request (HttpRequest): The incoming request object.
+
+    Returns:
+        A JSON response containing either the player's rankings, validation errors, or an error 
+        message.
+    """
+    def get(self, request: HttpRequest) -> Response:
+        query_serializer = PlayerRankQuerySerializer(data=request.query_params)
+        if not query_serializer.is_valid():
+            return Response(query_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        query = query_serializer.validated_data
+
+        [api_url] = get_source_urls(query.get("source")).values()
+        snapshot = fetch_snapshot(api_url)
+        rankings = snapshot.memoize(
+            PlayerRankings, lambda: PlayerRankings(snapshot.players, snapshot.element_types)
+        )
+
+        if "id" in query:
+            player = rankings.find_by_id(query["id"])
+            if not player:
                 return Response(
-                    outbound_serializer.errors, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                    {"error": f"No player found with id {query['id']}."}, 
+                    status=status.HTTP_404_NOT_FOUND
                 )
-            
-            return Response(magnificent_7_data, status=status.HTTP_200_OK)
+        else:
+            players = rankings.find_by_name(query["name"])
+            if not players:
+                return Response(
+                    {"error": f"No player found named '{query['name']}'."}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            if len(players) > 1:
+                return Response(
+                    {
+                        "error": f"'{query['name']}' matches more than one player.", 
+                        "ids": [player.id for player in players],
+                    }, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            [player] = players
+
+        return Response(rankings.rank(player), status=status.HTTP_200_OK)
+
+
+@csrf_exempt
+def get_magnificence_data_fast(request: HttpRequest) -> HttpResponse:
+    """
+    A lean handler for the common case of `GetMagnificenceDataView`, a GET request for the top 7 
+    players optionally filtered by `team_name` and `source`, which skips DRF's request wrapping, 
+    content negotiation and response rendering.
+
+    The top 7 players for each team of a snapshot are encoded to JSON bytes once and stored on 
+    the snapshot, so every request for the same team is served the same bytes until the snapshot 
+    is fetched again. Responses, including errors, have the same status codes and bodies as 
+    `GetMagnificenceDataView`. Any other request, such as one using `mode=optimal` or 
+    `source=all`, is handled by `GetMagnificenceDataView` itself, as is every request while 
+    `MAGNIFICENCE_PROFILING` is enabled, so that its requests can still be profiled.
+
+    It is used in place of `GetMagnificenceDataView` when `MAGNIFICENCE_FAST_PATH` is enabled, 
+    and like it is exempt from CSRF checks, so that other methods get the same 405 response.
+
+    Args:
+        request (HttpRequest): The incoming request object.
+
+    Returns:
+        A JSON response containing either the top 7 players, validation errors, or an error 
+        message if the external API fails to respond.
+    """
+    source = request.GET.get("source")
+    if (
+        request.method != "GET" 
+        or settings.MAGNIFICENCE_PROFILING["ENABLED"] 
+        or not FAST_PATH_QUERY_PARAMS.issuperset(request.GET) 
+        or (source is not None and source not in settings.MAGNIFICENCE_SOURCES)
+    ):
+        return _magnificence_data_view(request)
+
+    try:
+        [api_url] = get_source_urls(source).values()
+        snapshot = fetch_snapshot(api_url)
+
+        team_id = _get_team_id(snapshot, request.GET.get("team_name")) # optional param
+        content = snapshot.memoize(
+            ("magnificent_7_json", team_id), 
+            lambda: JSONRenderer().render(_get_top_7(snapshot, team_id))
+        )
+        return HttpResponse(content, content_type="application/json")
+    except APIException as exc:
+        return HttpResponse(
+            JSONRenderer().render(exc.detail), 
+            status=exc.status_code, 
+            content_type="application/json"
+        )
+
+
+def _get_magnificent_7(snapshot: Snapshot, query: dict, team_name: str) -> list[dict]:
+    """
+    Selects the Magnificent 7 from a single snapshot, raising a `ValidationError` if the 
+    team name is not valid or no squad satisfies the limits, or an `OutboundDataInvalid` 
+    error if the outbound data fails validation.
+    """
+    team_id = _get_team_id(snapshot, team_name)
+    if query["mode"] != "optimal":
+        return _get_top_7(snapshot, team_id)
+
+    magnificent_7_data = GetOptimalSquad(
+        snapshot.players, 
+        snapshot.element_types, 
+        query.get("budget"), 
+        query["max_per_team"], 
+        team_id
+    ).run()
+    if not magnificent_7_data:
+        raise ValidationError({"error": "No squad satisfies the budget and team limits."})
 
-        return Response({"error": "Failed to fetch data"}, status=status.HTTP_400_BAD_REQUEST)
+    return _validate_outbound(magnificent_7_data)
+
+
+def _get_top_7(snapshot: Snapshot, team_id: int | None) -> list[dict]:
+    """
+    Selects the top players in each position from a single snapshot, raising an 
+    `OutboundDataInvalid` error if the outbound data fails validation.
+    """
+    magnificent_7_data = GetMagnificent7(snapshot.players, snapshot.element_types, team_id).run()
+    return _validate_outbound(magnificent_7_data)
+
+
+def _get_team_id(snapshot: Snapshot, team_name: str | None) -> int | None:
+    """
+    Retrieves the ID of the team matching `team_name`, if given, raising a `ValidationError` if 
+    it is not a valid team.
+    """
+    if not team_name:
+        return None
+    team_id = snapshot.get_team_id(team_name)
+    if not team_id:
+        raise ValidationError({"error": f"'{team_name}' is not a valid team."})
+    return team_id
+
+
+def _get_position_id(snapshot: Snapshot, position: str | None) -> int | None:
+    """
+    Retrieves the ID of the position matching the short name `position`, if given, raising a 
+    `ValidationError` if it is not a valid position.
+    """
+    if not position:
+        return None
+    position_id = snapshot.get_position_id(position)
+    if not position_id:
+        raise ValidationError({"error": f"'{position}' is not a valid position."})
+    return position_id
+
+
+def _validate_outbound(magnificent_7_data: list[dict]) -> list[dict]:
+    """
+    Validates the Magnificent 7 using the `OutboundSerializer`, raising an `OutboundDataInvalid` 
+    error if it fails validation.
+    """
+    outbound_serializer = OutboundSerializer(data=magnificent_7_data)
+    if not outbound_serializer.is_valid():
+        raise OutboundDataInvalid(outbound_serializer.errors)
+    return magnificent_7_data
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Checks whether an `Accept-Encoding` header accepts gzip, either by name or with `*`, with a 
+    quality value above zero. An explicit `gzip` entry takes precedence over `*`.
+    """
+    qualities = {}
+    for entry in accept_encoding.split(","):
+        coding, _, params = entry.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def _gzip_stream(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Compresses a stream of chunks into a gzip stream, yielding output as the compressor 
+    produces it.
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,80 @@
+"""
+Benchmarks requests per second of `GetMagnificenceDataView` against the lean 
+`get_magnificence_data_fast` handler for the hot case, where the snapshot is already cached.
+
+The external API is replaced with the response recorded in the tests' cassettes, so no network 
+access is needed. Both handlers are called directly with the same request, so the numbers 
+compare the handlers themselves and leave out Django's middleware.
+
+Usage:
+    python benchmarks/fast_path.py --seconds 3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "magnificence.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+import yaml  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from api.views import GetMagnificenceDataView, get_magnificence_data_fast  # noqa: E402
+
+CASSETTE = BASE_DIR / "tests" / "cassettes" / "test_get_magnificence_data_view_returns_200.yaml"
+
+
+def requests_per_second(handler, request, seconds: float) -> float:
+    """
+    Calls `handler` with `request` repeatedly for `seconds` and returns the rate of calls.
+    """
+    count = 0
+    started_at = time.perf_counter()
+    deadline = started_at + seconds
+    while time.perf_counter() < deadline:
+        response = handler(request)
+        if callable(getattr(response, "render", None)):
+            response.render()
+        count += 1
+    return count / (time.perf_counter() - started_at)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    interaction = yaml.safe_load(CASSETTE.read_text())["interactions"][0]
+    payload = json.loads(interaction["response"]["body"]["string"])
+    api_response = MagicMock(status_code=200)
+    api_response.json.side_effect = lambda: payload
+
+    factory = RequestFactory()
+    drf_view = GetMagnificenceDataView.as_view()
+
+    with patch("requests.get", return_value=api_response):
+        for params in [{}, {"team_name": "Liverpool"}]:
+            request = factory.get("/api/get-magnificence-data/", params)
+            # Warm the snapshot cache and the encoded response before timing.
+            drf_view(request).render()
+            get_magnificence_data_fast(request)
+
+            drf_rps = requests_per_second(drf_view, request, args.seconds)
+            fast_rps = requests_per_second(get_magnificence_data_fast, request, args.seconds)
+            print(
+                f"{json.dumps(params):<28} DRF view {drf_rps:>9,.0f} req/s   "
+                f"fast path {fast_rps:>9,.0f} req/s   x{fast_rps / drf_rps:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -124,4 +124,43 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-MAGNIFICENCE_API_URL = "https://cors-proxy-90954623675.europe-west1.run.app/"
\ No newline at end of file
+MAGNIFICENCE_API_URL = "https://cors-proxy-90954623675.europe-west1.run.app/"
+
+# The named upstream sources the Magnificence views can fetch from with the `source` query
+# param, or all at once with `source=all`. Sources are fetched concurrently by up to
+# `MAGNIFICENCE_FETCH_WORKERS` threads, in a pool created on first use, so changing the number
+# of workers afterwards has no effect until the process restarts. A source that does not respond
+# within `MAGNIFICENCE_FETCH_TIMEOUT` seconds fails the request.
+
+MAGNIFICENCE_SOURCES = {
+    "fpl": MAGNIFICENCE_API_URL,
+}
+
+MAGNIFICENCE_DEFAULT_SOURCE = "fpl"
+
+MAGNIFICENCE_FETCH_WORKERS = 8
+
+MAGNIFICENCE_FETCH_TIMEOUT = 10
+
+# The number of seconds a source's snapshot is reused for before it is fetched again. Set to 0
+# to fetch on every request.
+
+MAGNIFICENCE_SNAPSHOT_TTL = 60
+
+# Serve the Magnificence endpoint with `api.views.get_magnificence_data_fast`, which returns the
+# top 7 players as pre-encoded JSON without going through DRF.
+
+MAGNIFICENCE_FAST_PATH = False
+
+
+# Opt-in per-request profiling of the Magnificence views, see `api.profiling.ProfilingMixin`.
+# A request is profiled if it sends `HEADER`, or at random with a probability of `SAMPLE_RATE`.
+
+MAGNIFICENCE_PROFILING = {
+    "ENABLED": False,
+    "HEADER": "X-Magnificence-Profile",
+    "SAMPLE_RATE": 0.0,
+    "DIRECTORY": BASE_DIR / "profiles",
+    "MAX_PROFILES": 100,
+    "TOP_ALLOCATIONS": 25,
+}
@@ -0,0 +1,10 @@
+import pytest
+
+from api.snapshots import clear_snapshot_cache
+
+
+@pytest.fixture(autouse=True)
+def snapshot_cache():
+    clear_snapshot_cache()
+    yield
+    clear_snapshot_cache()
@@ -0,0 +1,109 @@
+import json
+import pytest
+
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory
+from django.urls import reverse
+
+from api.profiling import _capture_lock
+from api.views import GetMagnificenceDataView
+
+factory = RequestFactory()
+view = GetMagnificenceDataView.as_view()
+
+
+@pytest.fixture
+def profiling(settings, tmp_path):
+    settings.MAGNIFICENCE_PROFILING = {
+        **settings.MAGNIFICENCE_PROFILING,
+        "ENABLED": True,
+        "DIRECTORY": tmp_path,
+        "MAX_PROFILES": 2,
+    }
+    return settings.MAGNIFICENCE_PROFILING
+
+
+def test_profiling_mixin_captures_request_with_header(profiling, vcr):
+    request = factory.get(
+        reverse("get_magnificence_data"), 
+        {"team_name": "Liverpool"}, 
+        HTTP_X_MAGNIFICENCE_PROFILE="1"
+    )
+    with vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"):
+        response = view(request)
+
+    captures = list(profiling["DIRECTORY"].glob("*.json"))
+    metadata = json.loads(captures[0].read_text())
+    assert response.status_code == 200
+    assert len(captures) == 1
+    assert captures[0].with_suffix(".prof").exists()
+    assert metadata["trigger"] == "header"
+    assert metadata["query_string"] == "team_name=Liverpool"
+    assert metadata["status_code"] == 200
+    assert metadata["allocations"]
+
+
+def test_profiling_mixin_skips_request_without_header_or_sample(profiling, vcr):
+    request = factory.get(reverse("get_magnificence_data"))
+    with vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"):
+        view(request)
+
+    assert list(profiling["DIRECTORY"].iterdir()) == []
+
+
+def test_profiling_mixin_skips_request_while_another_is_captured(profiling, vcr):
+    request = factory.get(reverse("get_magnificence_data"), HTTP_X_MAGNIFICENCE_PROFILE="1")
+    with (
+        vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"),
+        _capture_lock,
+    ):
+        response = view(request)
+
+    assert response.status_code == 200
+    assert list(profiling["DIRECTORY"].iterdir()) == []
+
+
+def test_profiling_mixin_keeps_most_recent_profiles_and_summarises_them(profiling, vcr, capsys):
+    profiling["SAMPLE_RATE"] = 1.0
+    request = factory.get(reverse("get_magnificence_data"))
+    with vcr.use_cassette(
+        "test_get_magnificence_data_view_returns_200", 
+        record_mode="none", 
+        allow_playback_repeats=True
+    ):
+        for _ in range(3):
+            view(request)
+
+    call_command("summarise_profiles", "--limit", "5")
+
+    output = capsys.readouterr().out
+    assert len(list(profiling["DIRECTORY"].glob("*.json"))) == 2
+    assert len(list(profiling["DIRECTORY"].glob("*.prof"))) == 2
+    assert output.startswith("2 profiles")
+    assert "Top functions:" in output
+    assert "Top allocations:" in output
+
+
+def test_summarise_profiles_only_counts_complete_captures(profiling, vcr, capsys):
+    profiling["SAMPLE_RATE"] = 1.0
+    request = factory.get(reverse("get_magnificence_data"))
+    with vcr.use_cassette(
+        "test_get_magnificence_data_view_returns_200", 
+        record_mode="none", 
+        allow_playback_repeats=True
+    ):
+        for _ in range(2):
+            view(request)
+
+    incomplete, complete = sorted(profiling["DIRECTORY"].glob("*.json"))
+    incomplete.with_suffix(".prof").unlink()
+    duration = json.loads(complete.read_text())["duration_ms"]
+
+    call_command("summarise_profiles")
+
+    output = capsys.readouterr().out
+    assert output.startswith(f"1 profiles, mean duration {duration:.1f} ms")
+
+    complete.write_text(json.dumps({"trigger": "header"}))
+    with pytest.raises(CommandError, match="Malformed profile metadata"):
+        call_command("summarise_profiles")
@@ -1,6 +1,6 @@
 import pytest
 
-from api.serializers import InboundSerializer, OutboundSerializer
+from api.serializers import InboundSerializer, OutboundSerializer, SquadQuerySerializer
 
 
 # Inbound Serializer
@@ -137,3 +137,22 @@ def test_outbound_serializer_raises_error_for_too_many_positions_in_data():
     assert serializer.errors == {
         "position": ["Too many position count for MID. There can only be 3 MID."]
     }
+
+
+# Query Serializer
+
+def test_squad_query_serializer_defaults_to_top_mode():
+    serializer = SquadQuerySerializer(data={})
+
+    assert serializer.is_valid()
+    assert serializer.validated_data == {"mode": "top", "max_per_team": 3}
+
+
+def test_squad_query_serializer_raises_error_for_invalid_limits():
+    serializer = SquadQuerySerializer(data={"mode": "optimal", "budget": -1, "max_per_team": 0})
+    serializer.is_valid()
+
+    assert serializer.errors == {
+        "budget": ["Ensure this value is greater than or equal to 0."],
+        "max_per_team": ["Ensure this value is greater than or equal to 1."],
+    }
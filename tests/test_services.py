@@ -1,10 +1,22 @@
+import gc
+import random
+import tracemalloc
+from collections import Counter
+from itertools import combinations, product
+
 import pytest
 import requests
 
 from django.conf import settings
 
 from api.serializers import OutboundSerializer
-from api.services import GetMagnificent7
+from api.services import (
+    POSITION_REQUIREMENTS, 
+    GetMagnificent7, 
+    GetOptimalSquad, 
+    PlayerRankings,
+)
+from api.snapshots import Player, Snapshot
 
 
 @pytest.mark.vcr(record_mode="once")
@@ -22,3 +34,243 @@ def test_get_magnificent_7_service():
     assert serializer.is_valid()
 
 
+def test_snapshot_footprint_is_smaller_than_raw_elements(vcr):
+    with vcr.use_cassette("test_get_magnificent_7_service", record_mode="none"):
+        response = requests.get(settings.MAGNIFICENCE_API_URL)
+
+    def traced_size(build):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = build()
+            size, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return result, size
+
+    # Build a snapshot first and keep it, so that growing the interpreter's table of interned 
+    # strings is not counted as part of the snapshot.
+    warm_up = Snapshot.from_payload(response.json())
+
+    elements, elements_size = traced_size(lambda: response.json()["elements"])
+    snapshot, snapshot_size = traced_size(lambda: Snapshot.from_payload(response.json()))
+
+    assert len(snapshot.players) == len(elements) == len(warm_up.players)
+    assert snapshot_size * 5 < elements_size
+
+
+def test_get_magnificent_7_service_accepts_player_records():
+    teams = {1: "Liverpool"}
+    elements = [
+        {"id": 1, "element_type": 1, "goals_scored": 0, "assists": 1, "web_name": "Alisson", "team": 1},
+        {"id": 2, "element_type": 2, "goals_scored": 3, "assists": 4, "web_name": "Trent", "team": 1},
+        {"id": 3, "element_type": 2, "goals_scored": 1, "assists": 0, "web_name": "Van Dijk", "team": 1},
+        {"id": 4, "element_type": 3, "goals_scored": 9, "assists": 5, "web_name": "Salah", "team": 1},
+        {"id": 5, "element_type": 3, "goals_scored": 2, "assists": 2, "web_name": "Szoboszlai", "team": 1},
+        {"id": 6, "element_type": 3, "goals_scored": 1, "assists": 6, "web_name": "Gakpo", "team": 1},
+        {"id": 7, "element_type": 4, "goals_scored": 7, "assists": 1, "web_name": "Jota", "team": 1},
+    ]
+    element_types = [
+        {"id": 1, "singular_name_short": "GKP"},
+        {"id": 2, "singular_name_short": "DEF"},
+        {"id": 3, "singular_name_short": "MID"},
+        {"id": 4, "singular_name_short": "FWD"},
+    ]
+    players = [Player.from_element(element, teams) for element in elements]
+
+    result = GetMagnificent7(players, element_types, team_id=1).run()
+
+    assert result == GetMagnificent7(elements, element_types, team_id=1).run()
+    assert result[1] == {"name": "Trent", "total_goals_assists": 7, "position": "DEF"}
+    assert players[0].team_name == "Liverpool"
+
+
+def test_get_optimal_squad_service_respects_budget_and_max_per_team(vcr):
+    with vcr.use_cassette("test_get_magnificent_7_service", record_mode="none"):
+        response = requests.get(settings.MAGNIFICENCE_API_URL)
+    snapshot = Snapshot.from_payload(response.json())
+    players_by_name = {player.web_name: player for player in snapshot.players}
+
+    unconstrained = GetOptimalSquad(snapshot.players, snapshot.element_types).run()
+    result = GetOptimalSquad(
+        snapshot.players, snapshot.element_types, budget=400, max_per_team=2
+    ).run()
+
+    squad = [players_by_name[player["name"]] for player in result]
+    assert OutboundSerializer(data=result).is_valid()
+    assert sum(player.now_cost for player in squad) <= 400
+    assert max(Counter(player.team for player in squad).values()) <= 2
+    assert (
+        sum(player["total_goals_assists"] for player in result) 
+        <= sum(player["total_goals_assists"] for player in unconstrained)
+    )
+
+
+def test_get_optimal_squad_service_picks_best_squad_within_limits():
+    teams = {1: "Liverpool", 2: "Arsenal"}
+    elements = [
+        {"id": 1, "element_type": 1, "goals_scored": 0, "assists": 1, "web_name": "Alisson", "team": 1, "now_cost": 55},
+        {"id": 2, "element_type": 1, "goals_scored": 0, "assists": 0, "web_name": "Raya", "team": 2, "now_cost": 55},
+        {"id": 3, "element_type": 2, "goals_scored": 3, "assists": 4, "web_name": "Trent", "team": 1, "now_cost": 70},
+        {"id": 4, "element_type": 2, "goals_scored": 1, "assists": 0, "web_name": "Van Dijk", "team": 1, "now_cost": 60},
+        {"id": 5, "element_type": 2, "goals_scored": 1, "assists": 0, "web_name": "Saliba", "team": 2, "now_cost": 60},
+        {"id": 6, "element_type": 3, "goals_scored": 9, "assists": 5, "web_name": "Salah", "team": 1, "now_cost": 130},
+        {"id": 7, "element_type": 3, "goals_scored": 5, "assists": 5, "web_name": "Saka", "team": 2, "now_cost": 100},
+        {"id": 8, "element_type": 3, "goals_scored": 2, "assists": 2, "web_name": "Odegaard", "team": 2, "now_cost": 85},
+        {"id": 9, "element_type": 3, "goals_scored": 1, "assists": 1, "web_name": "Rice", "team": 2, "now_cost": 65},
+        {"id": 10, "element_type": 4, "goals_scored": 7, "assists": 1, "web_name": "Jota", "team": 1, "now_cost": 75},
+        {"id": 11, "element_type": 4, "goals_scored": 4, "assists": 1, "web_name": "Havertz", "team": 2, "now_cost": 80},
+    ]
+    element_types = [
+        {"id": 1, "singular_name_short": "GKP"},
+        {"id": 2, "singular_name_short": "DEF"},
+        {"id": 3, "singular_name_short": "MID"},
+        {"id": 4, "singular_name_short": "FWD"},
+    ]
+    players = [Player.from_element(element, teams) for element in elements]
+
+    result = GetOptimalSquad(players, element_types, budget=540, max_per_team=4).run()
+
+    assert [player["name"] for player in result] == [
+        "Alisson", "Trent", "Saliba", "Salah", "Odegaard", "Rice", "Jota"
+    ]
+    assert GetOptimalSquad(players, element_types, budget=400).run() == []
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_get_optimal_squad_service_matches_brute_force_search(seed):
+    rng = random.Random(seed)
+    element_types = [
+        {"id": 1, "singular_name_short": "GKP"},
+        {"id": 2, "singular_name_short": "DEF"},
+        {"id": 3, "singular_name_short": "MID"},
+        {"id": 4, "singular_name_short": "FWD"},
+    ]
+    # Enough players to fill every position, then some at random.
+    positions = [
+        position_id for position_id, count in POSITION_REQUIREMENTS.items() for _ in range(count)
+    ]
+    players = [
+        Player.from_element({
+            "id": i, 
+            "element_type": positions[i] if i < len(positions) else rng.randint(1, 4), 
+            "goals_scored": rng.randint(0, 6), 
+            "assists": rng.randint(0, 4), 
+            "web_name": f"Player {i}", 
+            "team": rng.randint(1, 4), 
+            "now_cost": rng.randint(40, 120),
+        })
+        for i in range(rng.randint(10, 18))
+    ]
+    budget = rng.choice([None, rng.randint(400, 800)])
+    max_per_team = rng.randint(1, 4)
+    team_id = rng.choice([None, None, None, rng.randint(1, 4)])
+
+    def within_limits(squad):
+        team_counts = Counter(player.team for player in squad)
+        return (
+            (budget is None or sum(player.now_cost for player in squad) <= budget) 
+            and (team_id is not None or max(team_counts.values()) <= max_per_team)
+        )
+
+    eligible = [player for player in players if team_id is None or player.team == team_id]
+    picks_by_position = [
+        combinations([player for player in eligible if player.element_type == position_id], count)
+        for position_id, count in POSITION_REQUIREMENTS.items()
+    ]
+    scores = [
+        sum(player.total_goals_assists for player in squad) 
+        for squad in (sum(picks, ()) for picks in product(*picks_by_position)) 
+        if within_limits(squad)
+    ]
+    best_score = max(scores, default=None)
+
+    result = GetOptimalSquad(players, element_types, budget, max_per_team, team_id).run()
+
+    if best_score is None:
+        assert result == []
+        return
+    players_by_name = {player.web_name: player for player in players}
+    squad = [players_by_name[player["name"]] for player in result]
+    assert len(set(squad)) == 7
+    assert Counter(player.element_type for player in squad) == POSITION_REQUIREMENTS
+    assert team_id is None or {player.team for player in squad} == {team_id}
+    assert within_limits(squad)
+    assert sum(player["total_goals_assists"] for player in result) == best_score
+
+
+def test_get_optimal_squad_service_ignores_max_per_team_when_filtering_by_team(vcr):
+    with vcr.use_cassette("test_get_magnificent_7_service", record_mode="none"):
+        response = requests.get(settings.MAGNIFICENCE_API_URL)
+    snapshot = Snapshot.from_payload(response.json())
+    team_id = snapshot.get_team_id("Liverpool")
+
+    result = GetOptimalSquad(snapshot.players, snapshot.element_types, team_id=team_id).run()
+
+    top_7 = GetMagnificent7(snapshot.players, snapshot.element_types, team_id=team_id).run()
+    assert len(result) == 7
+    assert (
+        sum(player["total_goals_assists"] for player in result) 
+        == sum(player["total_goals_assists"] for player in top_7)
+    )
+
+
+def test_player_rankings_ranks_player_by_league_position_and_team():
+    teams = {1: "Liverpool", 2: "Arsenal"}
+    elements = [
+        {"id": 1, "element_type": 3, "goals_scored": 9, "assists": 5, "web_name": "Salah", "team": 1},
+        {"id": 2, "element_type": 3, "goals_scored": 5, "assists": 5, "web_name": "Saka", "team": 2},
+        {"id": 3, "element_type": 4, "goals_scored": 12, "assists": 3, "web_name": "Havertz", "team": 2},
+        {"id": 4, "element_type": 4, "goals_scored": 7, "assists": 3, "web_name": "Jota", "team": 1},
+        {"id": 5, "element_type": 2, "goals_scored": 0, "assists": 0, "web_name": "Gabriel", "team": 2},
+        {"id": 6, "element_type": 1, "goals_scored": 0, "assists": 0, "web_name": "Alisson", "team": 1},
+    ]
+    element_types = [
+        {"id": 1, "singular_name_short": "GKP"},
+        {"id": 2, "singular_name_short": "DEF"},
+        {"id": 3, "singular_name_short": "MID"},
+        {"id": 4, "singular_name_short": "FWD"},
+    ]
+    rankings = PlayerRankings(
+        [Player.from_element(element, teams) for element in elements], element_types
+    )
+
+    [salah] = rankings.find_by_name("salah")
+    [alisson] = rankings.find_by_name("Alisson")
+
+    assert rankings.find_by_id(1) == salah
+    assert rankings.rank(salah) == {
+        "id": 1,
+        "name": "Salah",
+        "position": "MID",
+        "team": "Liverpool",
+        "total_goals_assists": 14,
+        "rankings": {
+            "league": {"rank": 2, "percentile": 83.3, "players": 6},
+            "position": {"rank": 1, "percentile": 100.0, "players": 2},
+            "team": {"rank": 1, "percentile": 100.0, "players": 3},
+        },
+    }
+    assert rankings.rank(alisson)["rankings"]["league"] == {
+        "rank": 5, "percentile": 33.3, "players": 6
+    }
+
+
+def test_player_rankings_finds_player_by_other_names():
+    elements = [
+        {"id": 1, "element_type": 3, "goals_scored": 9, "assists": 5, "web_name": "M.Salah", "first_name": "Mohamed", "second_name": "Salah", "team": 1},
+        {"id": 2, "element_type": 2, "goals_scored": 4, "assists": 1, "web_name": "Gabriel", "first_name": "Gabriel", "second_name": "dos Santos Magalhães", "team": 2},
+        {"id": 3, "element_type": 4, "goals_scored": 3, "assists": 2, "web_name": "G.Jesus", "first_name": "Gabriel", "second_name": "Fernando de Jesus", "team": 2},
+        {"id": 4, "element_type": 2, "goals_scored": 1, "assists": 1, "web_name": "White", "first_name": "Benjamin", "second_name": "White", "team": 2},
+        {"id": 5, "element_type": 3, "goals_scored": 0, "assists": 1, "web_name": "White", "first_name": "Joe", "second_name": "White", "team": 3},
+    ]
+    element_types = [{"id": 2, "singular_name_short": "DEF"}, {"id": 3, "singular_name_short": "MID"}]
+    rankings = PlayerRankings([Player.from_element(element) for element in elements], element_types)
+
+    assert [player.id for player in rankings.find_by_name("Salah")] == [1]
+    assert [player.id for player in rankings.find_by_name(" mohamed SALAH ")] == [1]
+    assert [player.id for player in rankings.find_by_name("Magalhaes")] == [2]
+    assert [player.id for player in rankings.find_by_name("Gabriel")] == [2]
+    assert [player.id for player in rankings.find_by_name("jesus")] == [3]
+    assert [player.id for player in rankings.find_by_name("White")] == [4, 5]
+    assert rankings.find_by_name("Mohamed") == []
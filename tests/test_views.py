@@ -1,11 +1,22 @@
+import gzip
 import json
 import pytest
+import requests
+import time
 from unittest.mock import patch, MagicMock
 
+from django.middleware.csrf import CsrfViewMiddleware
 from django.test import RequestFactory
 from django.urls import reverse
 
-from api.views import GetMagnificenceDataView
+from api.snapshots import fetch_snapshot
+from api.views import (
+    ExportPlayersView, 
+    GetMagnificenceDataView, 
+    GetPlayerRankView, 
+    _get_top_7, 
+    get_magnificence_data_fast,
+)
 
 factory = RequestFactory()
 request = factory.get(reverse("get_magnificence_data"))
@@ -131,3 +142,418 @@ def test_get_magnificence_data_view_returns_400_if_team_name_is_not_valid(mock_g
     response_data = json.loads(response.content.decode("utf-8"))
     assert response.status_code == 400
     assert response_data == {"error": "'FakeTeam' is not a valid team."}
+
+
+def test_get_magnificence_data_view_returns_200_in_optimal_mode(vcr):
+    request = factory.get(
+        reverse("get_magnificence_data"), 
+        {"mode": "optimal", "budget": 400, "max_per_team": 2}
+    )
+    with vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"):
+        response = view(request)
+    response.render()
+
+    response_data = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 200
+    assert len(response_data) == 7
+
+
+def test_get_magnificence_data_view_returns_200_in_optimal_mode_for_a_team(vcr):
+    request = factory.get(
+        reverse("get_magnificence_data"), {"mode": "optimal", "team_name": "Liverpool"}
+    )
+    with vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"):
+        response = view(request)
+    response.render()
+
+    response_data = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 200
+    assert len(response_data) == 7
+
+
+def test_get_magnificence_data_view_returns_400_if_query_params_are_not_valid():
+    request = factory.get(reverse("get_magnificence_data"), {"mode": "best", "budget": "lots"})
+    response = view(request)
+    response.render()
+
+    response_data = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 400
+    assert response_data == {
+        "mode": ['"best" is not a valid choice.'],
+        "budget": ["A valid integer is required."],
+    }
+
+
+@patch("requests.get")
+def test_get_magnificence_data_view_returns_400_if_no_squad_is_within_budget(mock_get):
+    valid_api_response = {
+        "events": [],
+        "game_settings": {},
+        "phases": [],
+        "teams": [],
+        "total_players": 10,
+        "elements": [],
+        "element_stats": [],
+        "element_types": [],
+    }
+
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = valid_api_response
+
+    request = factory.get(reverse("get_magnificence_data"), {"mode": "optimal", "budget": 100})
+    response = view(request)
+    response.render()
+
+    response_data = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 400
+    assert response_data == {"error": "No squad satisfies the budget and team limits."}
+
+
+# Export Players View
+
+export_view = ExportPlayersView.as_view()
+
+
+def test_export_players_view_streams_all_ranked_players(vcr):
+    request = factory.get(reverse("export_players"))
+    with vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"):
+        response = export_view(request)
+
+    rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+    scores = [row["total_goals_assists"] for row in rows]
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/x-ndjson"
+    assert len(rows) == 666
+    assert scores == sorted(scores, reverse=True)
+    assert [row["rank"] for row in rows] == [
+        1 + sum(other > score for other in scores) for score in scores
+    ]
+
+
+def test_export_players_view_filters_by_position_and_team_and_gzips(vcr):
+    request = factory.get(
+        reverse("export_players"), 
+        {"position": "mid", "team_name": "Liverpool"}, 
+        HTTP_ACCEPT_ENCODING="gzip, deflate"
+    )
+    with vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"):
+        response = export_view(request)
+
+    content = gzip.decompress(b"".join(response.streaming_content))
+    rows = [json.loads(line) for line in content.splitlines()]
+    assert response["Content-Encoding"] == "gzip"
+    assert rows
+    assert all(row["position"] == "MID" and row["team"] == "Liverpool" for row in rows)
+
+
+def test_export_players_view_does_not_gzip_if_gzip_is_refused(vcr):
+    request = factory.get(
+        reverse("export_players"), 
+        {"position": "GKP"}, 
+        HTTP_ACCEPT_ENCODING="gzip;q=0, *;q=0.5"
+    )
+    with vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"):
+        response = export_view(request)
+
+    rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+    assert not response.has_header("Content-Encoding")
+    assert all(row["position"] == "GKP" for row in rows)
+
+
+@patch("requests.get")
+def test_export_players_view_returns_400_if_position_or_team_is_not_valid(mock_get):
+    valid_api_response = {
+        "events": [],
+        "game_settings": {},
+        "phases": [],
+        "teams": [],
+        "total_players": 10,
+        "elements": [],
+        "element_stats": [],
+        "element_types": [{"id": 1, "singular_name_short": "GKP"}],
+    }
+
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = valid_api_response
+
+    request = factory.get(reverse("export_players"), {"position": "STR"})
+    response = export_view(request)
+    response.render()
+
+    response_data = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 400
+    assert response_data == {"error": "'STR' is not a valid position."}
+
+    request = factory.get(reverse("export_players"), {"position": "GKP", "team_name": "FakeTeam"})
+    response = export_view(request)
+    response.render()
+
+    response_data = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 400
+    assert response_data == {"error": "'FakeTeam' is not a valid team."}
+
+
+# Sources
+
+def test_get_magnificence_data_view_returns_200_for_all_sources(settings, vcr):
+    settings.MAGNIFICENCE_SOURCES = {
+        "fpl": settings.MAGNIFICENCE_API_URL,
+        "fpl-mirror": settings.MAGNIFICENCE_API_URL,
+    }
+    # Replay the cassette outside of VCR, which does not support concurrent requests.
+    with vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"):
+        api_response = requests.get(settings.MAGNIFICENCE_API_URL)
+
+    request = factory.get(reverse("get_magnificence_data"), {"source": "all"})
+    with patch("requests.get", return_value=api_response):
+        response = view(request)
+    response.render()
+
+    response_data = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 200
+    assert list(response_data) == ["fpl", "fpl-mirror"]
+    assert response_data["fpl"] == response_data["fpl-mirror"]
+    assert len(response_data["fpl"]) == 7
+
+
+def test_get_magnificence_data_view_returns_400_if_source_is_not_valid():
+    request = factory.get(reverse("get_magnificence_data"), {"source": "nba"})
+    response = view(request)
+    response.render()
+
+    response_data = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 400
+    assert response_data == {"source": ["'nba' is not a valid source."]}
+
+
+@patch("requests.get")
+def test_get_magnificence_data_view_returns_400_if_api_request_times_out(mock_get, settings):
+    mock_get.side_effect = requests.Timeout()
+    settings.MAGNIFICENCE_FETCH_TIMEOUT = 2.5
+
+    request = factory.get(reverse("get_magnificence_data"))
+    response = view(request)
+    response.render()
+
+    assert response.status_code == 400
+    assert json.loads(response.content.decode("utf-8")) == {"error": "Failed to fetch data"}
+    mock_get.assert_called_once_with(settings.MAGNIFICENCE_API_URL, timeout=2.5)
+
+
+@patch("requests.get")
+def test_fetch_snapshots_fetches_sources_concurrently(mock_get, settings):
+    def slow_response(api_url, timeout):
+        time.sleep(0.2)
+        return MagicMock(status_code=500)
+
+    mock_get.side_effect = slow_response
+    settings.MAGNIFICENCE_SOURCES = {f"source-{i}": f"https://example.com/{i}/" for i in range(4)}
+
+    request = factory.get(reverse("get_magnificence_data"), {"source": "all"})
+    started_at = time.perf_counter()
+    response = view(request)
+    response.render()
+
+    assert time.perf_counter() - started_at < 0.6
+    assert mock_get.call_count == 4
+    assert response.status_code == 400
+    assert json.loads(response.content.decode("utf-8")) == {"error": "Failed to fetch data"}
+
+
+@patch("requests.get")
+def test_fetch_snapshot_reuses_snapshot_until_ttl_expires(mock_get, settings):
+    valid_api_response = {
+        "events": [],
+        "game_settings": {},
+        "phases": [],
+        "teams": [],
+        "total_players": 10,
+        "elements": [],
+        "element_stats": [],
+        "element_types": [],
+    }
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = valid_api_response
+
+    first = fetch_snapshot(settings.MAGNIFICENCE_API_URL)
+    second = fetch_snapshot(settings.MAGNIFICENCE_API_URL)
+    settings.MAGNIFICENCE_SNAPSHOT_TTL = 0
+    third = fetch_snapshot(settings.MAGNIFICENCE_API_URL)
+
+    assert first is second
+    assert third is not first
+    assert mock_get.call_count == 2
+
+
+# Player Rank View
+
+rank_view = GetPlayerRankView.as_view()
+
+
+def test_get_player_rank_view_returns_200_by_name_and_id(vcr):
+    with vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"):
+        response = rank_view(factory.get(reverse("player_rank"), {"name": "m.salah"}))
+        response.render()
+        by_name = json.loads(response.content.decode("utf-8"))
+
+        response = rank_view(factory.get(reverse("player_rank"), {"id": by_name["id"]}))
+        response.render()
+        by_id = json.loads(response.content.decode("utf-8"))
+
+    assert response.status_code == 200
+    assert by_name == by_id
+    assert by_name["position"] == "MID"
+    assert by_name["team"] == "Liverpool"
+    assert by_name["name"] == "M.Salah"
+    assert by_name["rankings"]["league"]["players"] == 666
+
+
+def test_get_player_rank_view_finds_player_by_surname_or_returns_400_if_ambiguous(vcr):
+    with vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"):
+        response = rank_view(factory.get(reverse("player_rank"), {"name": "Salah"}))
+        response.render()
+        by_surname = json.loads(response.content.decode("utf-8"))
+
+        response = rank_view(factory.get(reverse("player_rank"), {"name": "Sarr"}))
+        response.render()
+        ambiguous = json.loads(response.content.decode("utf-8"))
+
+    assert by_surname["name"] == "M.Salah"
+    assert response.status_code == 400
+    assert ambiguous["error"] == "'Sarr' matches more than one player."
+    assert len(ambiguous["ids"]) == 3
+
+
+@patch("requests.get")
+def test_get_player_rank_view_returns_404_if_player_is_not_found(mock_get):
+    valid_api_response = {
+        "events": [],
+        "game_settings": {},
+        "phases": [],
+        "teams": [],
+        "total_players": 10,
+        "elements": [],
+        "element_stats": [],
+        "element_types": [],
+    }
+
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = valid_api_response
+
+    response = rank_view(factory.get(reverse("player_rank"), {"id": 9999}))
+    response.render()
+
+    response_data = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 404
+    assert response_data == {"error": "No player found with id 9999."}
+
+
+def test_get_player_rank_view_returns_400_if_neither_id_nor_name_is_given():
+    response = rank_view(factory.get(reverse("player_rank"), {"source": "all"}))
+    response.render()
+
+    response_data = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 400
+    assert response_data == {"source": ["Player ranks are only available for one source."]}
+
+    response = rank_view(factory.get(reverse("player_rank")))
+    response.render()
+
+    response_data = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 400
+    assert response_data == {"player": ["Either an id or a name is required."]}
+
+    response = rank_view(factory.get(reverse("player_rank"), {"id": 328, "name": "M.Salah"}))
+    response.render()
+
+    response_data = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 400
+    assert response_data == {"player": ["Only one of id or name is allowed."]}
+
+
+# Fast Path
+
+@pytest.mark.parametrize("params", [{}, {"team_name": "liverpool"}, {"team_name": "FakeTeam"}])
+def test_get_magnificence_data_fast_matches_drf_view(params, vcr):
+    request = factory.get(reverse("get_magnificence_data"), params)
+    with vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"):
+        drf_response = view(request)
+        drf_response.render()
+        fast_response = get_magnificence_data_fast(request)
+
+    assert fast_response.status_code == drf_response.status_code
+    assert fast_response["Content-Type"] == drf_response["Content-Type"]
+    assert fast_response.content == drf_response.content
+
+
+@patch("requests.get")
+def test_get_magnificence_data_fast_matches_drf_view_errors(mock_get):
+    mock_get.return_value.status_code = 500
+
+    response = get_magnificence_data_fast(request)
+
+    assert response.status_code == 400
+    assert json.loads(response.content.decode("utf-8")) == {"error": "Failed to fetch data"}
+
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = {"elements": {}}
+
+    response = get_magnificence_data_fast(request)
+    response_data = json.loads(response.content.decode("utf-8"))
+    assert response.status_code == 400
+    assert response_data["elements"] == ['Expected a list of items but got type "dict".']
+
+
+def test_get_magnificence_data_fast_encodes_each_team_once_per_snapshot(vcr):
+    request = factory.get(reverse("get_magnificence_data"), {"team_name": "Liverpool"})
+    with (
+        vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"),
+        patch("api.views._get_top_7", wraps=_get_top_7) as mock_get_top_7,
+    ):
+        first = get_magnificence_data_fast(request)
+        second = get_magnificence_data_fast(request)
+
+    assert first.content == second.content
+    assert mock_get_top_7.call_count == 1
+
+
+@patch("api.views._magnificence_data_view")
+def test_get_magnificence_data_fast_delegates_other_queries_to_drf_view(mock_view):
+    request = factory.get(reverse("get_magnificence_data"), {"mode": "optimal"})
+
+    response = get_magnificence_data_fast(request)
+
+    assert response == mock_view.return_value
+    mock_view.assert_called_once_with(request)
+
+
+def test_get_magnificence_data_fast_returns_405_for_other_methods_without_csrf_token():
+    request = factory.post(reverse("get_magnificence_data"))
+    csrf_middleware = CsrfViewMiddleware(get_magnificence_data_fast)
+
+    assert csrf_middleware.process_view(request, get_magnificence_data_fast, (), {}) is None
+
+    response = get_magnificence_data_fast(request)
+    response.render()
+
+    assert response.status_code == 405
+    assert json.loads(response.content.decode("utf-8")) == {
+        "detail": 'Method "POST" not allowed.'
+    }
+
+
+def test_get_magnificence_data_fast_delegates_to_drf_view_while_profiling(settings, tmp_path, vcr):
+    settings.MAGNIFICENCE_PROFILING = {
+        **settings.MAGNIFICENCE_PROFILING, "ENABLED": True, "DIRECTORY": tmp_path
+    }
+    request = factory.get(
+        reverse("get_magnificence_data"), 
+        {"team_name": "Liverpool"}, 
+        HTTP_X_MAGNIFICENCE_PROFILE="1"
+    )
+    with vcr.use_cassette("test_get_magnificence_data_view_returns_200", record_mode="none"):
+        response = get_magnificence_data_fast(request)
+
+    assert response.status_code == 200
+    assert len(list(tmp_path.glob("*.json"))) == 1
+    assert len(list(tmp_path.glob("*.prof"))) == 1